@@ -1,22 +1,132 @@
 import os
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 from datetime import datetime
 import asyncio
+import time
+import hashlib
+import random
+from collections import OrderedDict
 
 # Third-party imports
 import google.generativeai as genai
 from supabase import create_client, Client
+from postgrest.utils import SyncClient
 import httpx
 
 logger = logging.getLogger(__name__)
 
+EMPTY_RESPONSE_MESSAGE = "I apologize, but I'm having trouble generating a response right now. Please try again."
+ERROR_RESPONSE_MESSAGE = "I apologize, but I'm experiencing technical difficulties. Please try again later."
+# Canned replies returned when generation fails; these must never be cached
+FALLBACK_RESPONSES = frozenset({EMPTY_RESPONSE_MESSAGE, ERROR_RESPONSE_MESSAGE})
+
+GEMINI_MODEL_NAME = 'models/gemini-2.5-flash-preview-05-20'
+
+# Upper bound on concurrent Gemini generations per worker, to stay under API rate limits
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+
+# Bounding output tokens bounds worst-case generation latency. Gemini 2.5 Flash thinks by default and
+# its thinking tokens count against this cap (the pinned SDK cannot set a thinking budget), so it must
+# leave room for thinking plus a concierge answer; a tight cap ends generation before any answer text
+GENERATION_CONFIG = dict(max_output_tokens=4096, temperature=0.4, candidate_count=1)
+
+# Connection pool for Supabase PostgREST calls, shared across requests. Calls run on the default
+# to_thread executor (at most 32 threads), so the pool is never exhausted and never times out
+SUPABASE_POOL_LIMITS = dict(max_connections=120, max_keepalive_connections=80, keepalive_expiry=60)
+SUPABASE_TIMEOUT = dict(timeout=30.0, connect=5.0)
+
+# chat_history rows are written in bulk: up to this many rows per insert,
+# after waiting this long for concurrent interactions to accumulate
+INSERT_BATCH_SIZE = 100
+INSERT_FLUSH_INTERVAL_SECONDS = 0.2
+
+# Number of past interactions included in the prompt
+HISTORY_TURNS = 5
+
+# Character budgets for the variable prompt sections; prompt size drives Gemini latency
+MAX_KNOWLEDGE_CHARS = 4000
+MAX_HISTORY_CHARS = 2000
+
+# Sessions whose recent chat history is kept in memory (least recently used evicted)
+HISTORY_CACHE_SIZE = 1024
+
+# /summary output per language is reused until /updatedb signals new data, or for at most a day
+SUMMARY_CACHE_TTL_SECONDS = 24 * 3600
+
+# How long /health reuses the last probe result before re-checking a service
+HEALTH_CHECK_TTL_SECONDS = 15
+
+# Static part of every chat prompt, sent as the model's system instruction
+SYSTEM_INSTRUCTION = """You are a helpful assistant for a restaurant called "麵屋心" (Mian Wu Xin). You specialize in providing information about the restaurant's menu, services, hours, and general dining experience.
+
+Each request provides a language instruction, Restaurant Knowledge, the Conversation History and the Current User Question.
+
+Instructions:
+- Be friendly, helpful, and professional
+- Focus on restaurant-related topics
+- ALWAYS use the Restaurant Knowledge provided to answer questions
+- If the Restaurant Knowledge contains relevant information, use it directly in your response
+- Only suggest contacting the restaurant if the specific information is not in the Restaurant Knowledge
+- Keep responses concise but informative
+- STRICTLY follow the language instructions provided
+- Maintain the conversational context from previous messages"""
+
+_LANG = {
+    "en": "Respond in English",
+    "zh": "请用中文回答",
+    "ja": "日本語で回答してください",
+    "ko": "한국어로 답변해주세요"
+}
+
+# Per-request part of the prompt, filled in by ChatbotAI._create_prompt
+_PROMPT_TEMPLATE = """{lang_instruction}.
+
+Restaurant Knowledge (USE THIS INFORMATION TO ANSWER):
+{knowledge}
+
+Conversation History:
+{history}
+
+Current User Question: {query}
+
+Response:"""
+
+async def retry_db_operation(fn, retries: int = 3, base: float = 0.05):
+    """Await fn(), retrying transient connection failures with jittered exponential backoff
+    
+    Only errors raised before the request reaches Supabase are retried, so inserts are never duplicated.
+    """
+    for attempt in range(retries):
+        try:
+            return await fn()
+        except httpx.ConnectError as e:
+            if attempt == retries - 1:
+                raise
+            delay = base * (2 ** attempt) + random.random() * base
+            logger.warning("Supabase call failed (%s), retrying in %.2fs", e, delay)
+            await asyncio.sleep(delay)
+
 class ChatbotAI:
     """Handles AI operations including Gemini API calls and Supabase database operations"""
     
     def __init__(self):
         self.supabase: Optional[Client] = None
+        self.http_client: Optional[SyncClient] = None
         self.gemini_model = None
+        self.generation_config = None
+        self._health_cache: Dict[str, tuple] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._summary_cache: Dict[str, tuple] = {}
+        self._gemini_slots = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+        self._insert_queue: asyncio.Queue = asyncio.Queue()
+        self._insert_task: Optional[asyncio.Task] = None
+        # session_id -> (limit, rows); this process is the only writer of chat_history
+        self._history_cache: "OrderedDict[str, tuple]" = OrderedDict()
+        # session_id -> rows queued for insert but not yet written; a fetch cannot see these
+        self._pending_rows: Dict[str, List[Dict[str, Any]]] = {}
+        # Completed bulk inserts, so a fetch can tell whether a batch landed while it was in flight
+        self._flush_count = 0
         
     async def initialize(self):
         """Initialize Supabase client and Gemini model"""
@@ -29,6 +139,7 @@ class ChatbotAI:
                 raise ValueError("Supabase credentials not found in environment variables")
             
             self.supabase = create_client(supabase_url, supabase_key)
+            self._configure_http_pool()
             
             # Initialize Gemini
             gemini_api_key = os.getenv("GEMINI_API_KEY")
@@ -36,166 +147,370 @@ class ChatbotAI:
                 raise ValueError("Gemini API key not found in environment variables")
             
             genai.configure(api_key=gemini_api_key)
-            self.gemini_model = genai.GenerativeModel('models/gemini-2.5-flash-preview-05-20')
+            self.generation_config = genai.GenerationConfig(**GENERATION_CONFIG)
+            self.gemini_model = genai.GenerativeModel(
+                GEMINI_MODEL_NAME,
+                system_instruction=SYSTEM_INSTRUCTION,
+                generation_config=self.generation_config
+            )
             
             # Create chat_history table if it doesn't exist
             await self._create_chat_history_table()
             
+            if self._insert_task is None:
+                self._insert_task = asyncio.create_task(self._flush_inserts())
+            
             logger.info("ChatbotAI initialized successfully")
             
         except Exception as e:
             logger.error(f"Failed to initialize ChatbotAI: {e}")
             raise
     
+    def _configure_http_pool(self):
+        """Route PostgREST requests through a pooled HTTP/2 client with keepalive"""
+        postgrest = self.supabase.postgrest
+        default_session = postgrest.session
+        
+        # supabase 2.0 has no option to inject a client, so swap the session it created.
+        # SyncClient (an httpx.Client with aclose()) is what SyncPostgrestClient expects on close.
+        # Note: supabase resets its postgrest client on auth events (SIGNED_IN, TOKEN_REFRESHED,
+        # SIGNED_OUT), which silently replaces this pool with a default one; this backend uses the
+        # service key and never signs in, so that does not happen here
+        self.http_client = SyncClient(
+            base_url=default_session.base_url,
+            headers=default_session.headers,
+            limits=httpx.Limits(**SUPABASE_POOL_LIMITS),
+            timeout=httpx.Timeout(**SUPABASE_TIMEOUT),
+            http2=True
+        )
+        postgrest.session = self.http_client
+        default_session.close()
+        logger.info("Configured pooled HTTP client for Supabase")
+    
+    async def close(self):
+        """Stop background tasks and close HTTP connections"""
+        if self._insert_task is not None:
+            # Write out queued interactions before shutting down
+            await self._insert_queue.join()
+            self._insert_task.cancel()
+            self._insert_task = None
+        if self.http_client is not None:
+            self.http_client.close()
+            self.http_client = None
+    
+    async def execute(self, query):
+        """Run a Supabase query builder on a worker thread so the event loop stays free"""
+        return await retry_db_operation(lambda: asyncio.to_thread(query.execute))
+    
     async def _create_chat_history_table(self):
         """Create the chat_history table in Supabase if it doesn't exist"""
         try:
             # Check if table exists and create if needed
-            result = self.supabase.table('chat_history').select('id').limit(1).execute()
+            result = await self.execute(self.supabase.table('chat_history').select('id').limit(1))
             logger.info("chat_history table exists or was created successfully")
         except Exception as e:
             logger.warning(f"Note: chat_history table may need to be created manually: {e}")
     
-    async def get_chat_history(self, session_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+    async def get_chat_history(self, session_id: str, limit: int = HISTORY_TURNS) -> List[Dict[str, Any]]:
         """Retrieve chat history for a session"""
+        cached = self._history_cache.get(session_id)
+        if cached is not None and cached[0] >= limit:
+            self._history_cache.move_to_end(session_id)
+            return list(cached[1][-limit:])
+        
         try:
-            result = self.supabase.table('chat_history').select('*').eq('session_id', session_id).order('timestamp', desc=True).limit(limit).execute()
+            flush_count = self._flush_count
+            result = await self.execute(self.supabase.table('chat_history').select('query,response').eq('session_id', session_id).order('timestamp', desc=True).limit(limit))
             
             # Reverse to get chronological order
             history = list(reversed(result.data))
-            logger.info(f"Retrieved {len(history)} messages for session {session_id}")
-            return history
+            logger.info("Retrieved %d messages for session %s", len(history), session_id)
+            
+            # Turns still waiting in the insert queue are not in the database yet
+            pending = self._pending_rows.get(session_id)
+            if pending:
+                fetched = {(row['query'], row['response']) for row in history}
+                history = (history + [row for row in pending if (row['query'], row['response']) not in fetched])[-limit:]
+            
+            # A batch written during the fetch may or may not be in the result; only cache a complete view
+            if self._flush_count == flush_count:
+                self._history_cache[session_id] = (limit, history)
+                self._history_cache.move_to_end(session_id)
+                if len(self._history_cache) > HISTORY_CACHE_SIZE:
+                    self._history_cache.popitem(last=False)
+            return list(history)
             
         except Exception as e:
             logger.error(f"Error retrieving chat history: {e}")
             return []
     
     async def store_interaction(self, session_id: str, query: str, response: str, language: str):
-        """Store a chat interaction in the database"""
-        try:
-            data = {
-                "session_id": session_id,
-                "query": query,
-                "response": response,
-                "language": language,
-                "timestamp": datetime.utcnow().isoformat()
-            }
+        """Queue a chat interaction for the next bulk insert into the database"""
+        data = {
+            "session_id": session_id,
+            "query": query,
+            "response": response,
+            "language": language,
+            # Set here, not by DEFAULT NOW(): now() is the transaction start, so every row in a
+            # bulk insert would share it and turns of one session would lose their order
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        
+        self._pending_rows.setdefault(session_id, []).append(data)
+        await self._insert_queue.put(data)
+        logger.info("Queued interaction for session %s", session_id)
+        
+        # Keep the cached history in step so the next turn needs no round-trip
+        cached = self._history_cache.get(session_id)
+        if cached is not None:
+            limit, rows = cached
+            self._history_cache[session_id] = (limit, (rows + [data])[-limit:])
+    
+    async def _flush_inserts(self):
+        """Drain queued chat_history rows and write them with bulk inserts"""
+        while True:
+            batch = [await self._insert_queue.get()]
             
-            result = self.supabase.table('chat_history').insert(data).execute()
-            logger.info(f"Stored interaction for session {session_id}")
+            # Give concurrent requests a moment to queue their rows too
+            await asyncio.sleep(INSERT_FLUSH_INTERVAL_SECONDS)
+            while len(batch) < INSERT_BATCH_SIZE and not self._insert_queue.empty():
+                batch.append(self._insert_queue.get_nowait())
             
-        except Exception as e:
-            logger.error(f"Error storing interaction: {e}")
-            raise
+            try:
+                result = await self.execute(self.supabase.table('chat_history').insert(batch))
+                logger.info("Stored %d interactions", len(batch))
+            except Exception as e:
+                logger.error(f"Error storing {len(batch)} interactions: {e}")
+            finally:
+                self._flush_count += 1
+                for row in batch:
+                    pending = self._pending_rows.get(row['session_id'])
+                    if pending is not None:
+                        # Identity, not equality: a session may repeat the same exchange
+                        pending[:] = [queued for queued in pending if queued is not row]
+                        if not pending:
+                            del self._pending_rows[row['session_id']]
+                    self._insert_queue.task_done()
     
-    async def generate_response(self, query: str, language: str, context: List[str], history: List[Dict[str, Any]]) -> str:
-        """Generate a response using Gemini API with context and history"""
+    async def generate_response(self, query: str, language: str, context: List[str], history: List[Dict[str, Any]],
+                                max_knowledge_chars: Optional[int] = MAX_KNOWLEDGE_CHARS,
+                                max_output_tokens: Optional[int] = None) -> str:
+        """Generate a response using Gemini API with context and history
+        
+        max_knowledge_chars caps the knowledge section of the prompt; pass None to send it whole.
+        max_output_tokens overrides the model's default output cap for this call.
+        """
         try:
-            # Build conversation context
-            conversation_context = self._build_conversation_context(history)
-            logger.info(f"Building conversation context for query: {conversation_context}")
-            
-            # Build knowledge context
-            knowledge_context = "\n".join(context) if context else "No specific restaurant information available."
-            
-            # Debug logging
-            logger.info(f"Query: {query}")
-            logger.info(f"Retrieved context pieces: {len(context)}")
-            if context:
-                logger.info(f"Context preview: {knowledge_context}")
-            else:
-                logger.info("No context retrieved")
+            prompt = self._prepare_prompt(query, language, context, history, max_knowledge_chars)
+            
+            overrides = {"max_output_tokens": max_output_tokens} if max_output_tokens else None
             
-            # Create prompt based on language
-            prompt = self._create_prompt(query, language, knowledge_context, conversation_context)
+            # Identical prompts in flight share one Gemini call instead of issuing duplicates
+            key = hashlib.sha256(f"{max_output_tokens}\x00{prompt}".encode()).hexdigest()
+            task = self._inflight.get(key)
+            if task is None:
+                task = asyncio.create_task(self._call_gemini(prompt, overrides))
+                self._inflight[key] = task
+                task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            else:
+                logger.info("Joining in-flight Gemini request for query: %.50s...", query)
             
-            # Generate response using Gemini
-            response = self.gemini_model.generate_content(prompt)
+            # Shield so one caller disconnecting does not cancel the call for the others
+            text = await asyncio.shield(task)
             
-            if response.text:
-                logger.info(f"Generated response for query: {query[:50]}...")
-                return response.text.strip()
+            if text:
+                logger.info("Generated response for query: %.50s...", query)
+                return text.strip()
             else:
                 logger.warning("Empty response from Gemini API")
-                return "I apologize, but I'm having trouble generating a response right now. Please try again."
+                return EMPTY_RESPONSE_MESSAGE
                 
         except Exception as e:
             logger.error(f"Error generating response with Gemini: {e}")
-            return "I apologize, but I'm experiencing technical difficulties. Please try again later."
+            return ERROR_RESPONSE_MESSAGE
+    
+    async def _call_gemini(self, prompt: str, generation_config: Optional[Dict[str, Any]]) -> str:
+        """Run one Gemini generation"""
+        async with self._gemini_slots:
+            response = await self.gemini_model.generate_content_async(prompt, generation_config=generation_config)
+        try:
+            return response.text
+        except ValueError:
+            # No answer parts, e.g. the output cap was spent on thinking
+            finish_reason = response.candidates[0].finish_reason if response.candidates else None
+            logger.warning("Gemini returned no text (finish reason: %s)", finish_reason)
+            return ""
+    
+    async def generate_response_stream(self, query: str, language: str, context: List[str], history: List[Dict[str, Any]]) -> AsyncIterator[str]:
+        """Generate a response using Gemini API, yielding text chunks as they arrive
+        
+        A failure before any text yields ERROR_RESPONSE_MESSAGE; a failure after partial
+        output is re-raised so the caller knows the response was cut off.
+        """
+        emitted = False
+        try:
+            prompt = self._prepare_prompt(query, language, context, history)
+            
+            async with self._gemini_slots:
+                response = await self.gemini_model.generate_content_async(prompt, stream=True)
+                
+                async for chunk in response:
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks without text parts (e.g. the final finish-reason chunk)
+                        continue
+                    if text:
+                        emitted = True
+                        yield text
+            
+            if emitted:
+                logger.info("Streamed response for query: %.50s...", query)
+            else:
+                logger.warning("Empty streamed response from Gemini API")
+                yield EMPTY_RESPONSE_MESSAGE
+                
+        except Exception as e:
+            logger.error(f"Error streaming response with Gemini: {e}")
+            if emitted:
+                raise
+            yield ERROR_RESPONSE_MESSAGE
+    
+    def get_cached_summary(self, language: str) -> Optional[str]:
+        """Return the stored /summary text for a language if it is still fresh"""
+        cached = self._summary_cache.get(language)
+        if cached is not None and time.monotonic() - cached[1] < SUMMARY_CACHE_TTL_SECONDS:
+            return cached[0]
+        return None
+    
+    def cache_summary(self, language: str, summary: str):
+        """Remember a generated /summary text; failure messages are not kept"""
+        if summary not in FALLBACK_RESPONSES:
+            self._summary_cache[language] = (summary, time.monotonic())
+    
+    def invalidate_summary_cache(self):
+        """Drop all stored summaries after the restaurant data changed"""
+        self._summary_cache.clear()
+    
+    def _prepare_prompt(self, query: str, language: str, context: List[str], history: List[Dict[str, Any]],
+                        max_knowledge_chars: Optional[int] = MAX_KNOWLEDGE_CHARS) -> str:
+        """Assemble the per-request prompt from knowledge context and history"""
+        # Build conversation context
+        conversation_context = self._build_conversation_context(history)
+        
+        # Build knowledge context
+        knowledge_context = self._build_knowledge_context(context, max_knowledge_chars)
+        
+        logger.info("Retrieved context pieces: %d", len(context))
+        # Full prompt sections are large; only format them when debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Query: %s", query)
+            logger.debug("Conversation context: %s", conversation_context)
+            logger.debug("Context preview: %s", knowledge_context)
+        
+        # Create prompt based on language
+        return self._create_prompt(query, language, knowledge_context, conversation_context)
+    
+    def _build_knowledge_context(self, context: List[str], max_chars: Optional[int]) -> str:
+        """Join retrieved context pieces, dropping the lowest-ranked ones beyond the budget"""
+        if not context:
+            return "No specific restaurant information available."
+        
+        knowledge_context = "\n".join(context)
+        if max_chars is None or len(knowledge_context) <= max_chars:
+            return knowledge_context
+        
+        # Pieces arrive best match first, so keep whole pieces from the front
+        kept = []
+        used = 0
+        for piece in context:
+            cost = len(piece) + (1 if kept else 0)
+            if used + cost > max_chars:
+                break
+            kept.append(piece)
+            used += cost
+        if not kept:
+            kept = [context[0][:max_chars]]
+        
+        logger.info("Truncated knowledge context from %d to %d chars (%d/%d pieces)",
+                    len(knowledge_context), used or max_chars, len(kept), len(context))
+        return "\n".join(kept)
     
     def _build_conversation_context(self, history: List[Dict[str, Any]]) -> str:
-        """Build conversation context from chat history"""
+        """Build conversation context from chat history, newest turns first within the budget"""
         if not history:
             return "This is the start of a new conversation."
         
-        context_parts = []
-        for interaction in history[-5:]:  # Use last 5 interactions
-            context_parts.append(f"User: {interaction['query']}")
-            context_parts.append(f"Assistant: {interaction['response']}")
+        turns = []
+        used = 0
+        for interaction in reversed(history[-HISTORY_TURNS:]):
+            turn = f"User: {interaction['query']}\nAssistant: {interaction['response']}"
+            cost = len(turn) + (1 if turns else 0)
+            if used + cost > MAX_HISTORY_CHARS:
+                if not turns:
+                    # Keep the question and the start of the answer; cut the answer to fit
+                    head = f"User: {interaction['query']}\nAssistant: "
+                    budget = max(MAX_HISTORY_CHARS - len(head), 0)
+                    turns.append(head + interaction['response'][:budget])
+                logger.info("Truncated conversation history to %d of %d turns", len(turns), min(len(history), HISTORY_TURNS))
+                break
+            turns.append(turn)
+            used += cost
         
-        return "\n".join(context_parts)
+        return "\n".join(reversed(turns))
     
     def _create_prompt(self, query: str, language: str, knowledge_context: str, conversation_context: str) -> str:
-        """Create a comprehensive prompt for the Gemini API"""
-        
-        language_instructions = {
-            "en": "Respond in English",
-            "zh": "请用中文回答",
-            "ja": "日本語で回答してください",
-            "ko": "한국어로 답변해주세요"
-        }
-        
-        lang_instruction = language_instructions.get(language, "Respond in English")
-        
-        prompt = f"""You are a helpful assistant for a restaurant called "麵屋心" (Mian Wu Xin). You specialize in providing information about the restaurant's menu, services, hours, and general dining experience.
-
-{lang_instruction}.
-
-Restaurant Knowledge (USE THIS INFORMATION TO ANSWER):
-{knowledge_context}
-
-Conversation History:
-{conversation_context}
-
-Current User Question: {query}
-
-Instructions:
-- Be friendly, helpful, and professional
-- Focus on restaurant-related topics
-- ALWAYS use the Restaurant Knowledge provided above to answer questions
-- If the Restaurant Knowledge contains relevant information, use it directly in your response
-- Only suggest contacting the restaurant if the specific information is not in the Restaurant Knowledge
-- Keep responses concise but informative
-- STRICTLY follow the language instructions provided
-- Maintain the conversational context from previous messages
-
-Response:"""
-
-        return prompt
+        """Create the per-request part of the prompt; the static part lives in SYSTEM_INSTRUCTION"""
+        return _PROMPT_TEMPLATE.format_map({
+            'lang_instruction': _LANG.get(language, _LANG['en']),
+            'knowledge': knowledge_context,
+            'history': conversation_context,
+            'query': query
+        })
     
     async def clear_session_history(self, session_id: str):
         """Clear all chat history for a session"""
         try:
-            result = self.supabase.table('chat_history').delete().eq('session_id', session_id).execute()
+            # Make sure queued rows for this session do not land after the delete
+            await self._insert_queue.join()
+            self._history_cache.pop(session_id, None)
+            result = await self.execute(self.supabase.table('chat_history').delete().eq('session_id', session_id))
             logger.info(f"Cleared history for session {session_id}")
         except Exception as e:
             logger.error(f"Error clearing session history: {e}")
             raise
     
     async def check_database_connection(self) -> bool:
-        """Check if Supabase connection is working"""
+        """Check if Supabase connection is working (cached for a few seconds)"""
+        return await self._cached_check('supabase', self._probe_database)
+    
+    async def check_gemini_connection(self) -> bool:
+        """Check if Gemini API connection is working (cached for a few seconds)"""
+        return await self._cached_check('gemini', self._probe_gemini)
+    
+    async def _cached_check(self, name: str, probe, ttl: float = HEALTH_CHECK_TTL_SECONDS) -> bool:
+        """Return the last probe result while it is fresh, otherwise re-probe"""
+        cached = self._health_cache.get(name)
+        if cached is not None and time.monotonic() - cached[1] < ttl:
+            return cached[0]
+        
+        status = await probe()
+        self._health_cache[name] = (status, time.monotonic())
+        return status
+    
+    async def _probe_database(self) -> bool:
         try:
-            result = self.supabase.table('chat_history').select('id').limit(1).execute()
+            result = await self.execute(self.supabase.table('chat_history').select('id').limit(1))
             return True
         except Exception as e:
             logger.error(f"Database connection check failed: {e}")
             return False
     
-    async def check_gemini_connection(self) -> bool:
-        """Check if Gemini API connection is working"""
+    async def _probe_gemini(self) -> bool:
         try:
-            response = self.gemini_model.generate_content("Test connection")
-            return bool(response.text)
+            # Listing models verifies the key without spending an inference
+            model = await asyncio.to_thread(lambda: next(iter(genai.list_models()), None))
+            return model is not None
         except Exception as e:
             logger.error(f"Gemini connection check failed: {e}")
-            return False
\ No newline at end of file
+            return False
@@ -0,0 +1,162 @@
+import os
+import time
+import sqlite3
+import logging
+import asyncio
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+class SemanticCache:
+    """Caches chatbot responses keyed by a local query embedding for near-duplicate lookups"""
+
+    def __init__(self):
+        self.db_path = os.getenv("SEMANTIC_CACHE_PATH", "semantic_cache.db")
+        self.model_name = os.getenv("SEMANTIC_CACHE_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+        self.max_distance = float(os.getenv("SEMANTIC_CACHE_MAX_DISTANCE", "0.15"))
+        self.ttl_seconds = int(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+        # Lookups scan every fresh row for the language, so the table is kept bounded (oldest evicted first)
+        self.max_entries = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+        self.conn: Optional[sqlite3.Connection] = None
+        self.embedding_model = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.conn is not None and self.embedding_model is not None
+
+    async def initialize(self):
+        """Load the embedding model and open the sqlite-vec cache database"""
+        try:
+            await asyncio.to_thread(self._setup)
+            logger.info(f"SemanticCache initialized with model {self.model_name}")
+        except Exception as e:
+            # The cache is an optimization only; chat keeps working without it
+            self.conn = None
+            self.embedding_model = None
+            logger.warning(f"Semantic cache disabled: {e}")
+
+    def _setup(self):
+        """Blocking part of initialize, run on a worker thread"""
+        import sqlite_vec
+        from sentence_transformers import SentenceTransformer
+
+        self.embedding_model = SentenceTransformer(self.model_name)
+
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.enable_load_extension(True)
+        sqlite_vec.load(conn)
+        conn.enable_load_extension(False)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                language TEXT NOT NULL,
+                query TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_response_cache_lookup "
+            "ON response_cache(language, expires_at)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_response_cache_expires "
+            "ON response_cache(expires_at)"
+        )
+        conn.commit()
+        self.conn = conn
+
+    async def embed(self, query: str) -> Optional[bytes]:
+        """Embed a query as a float32 blob, or None if the cache is unavailable"""
+        if not self.enabled:
+            return None
+        try:
+            return await asyncio.to_thread(self._embed, query)
+        except Exception as e:
+            logger.error(f"Error embedding query for semantic cache: {e}")
+            return None
+
+    def _embed(self, query: str) -> bytes:
+        vector = self.embedding_model.encode(query, normalize_embeddings=True)
+        return vector.astype("float32").tobytes()
+
+    async def lookup(self, embedding: Optional[bytes], language: str) -> Optional[str]:
+        """Return a cached response for the closest stored query within the distance threshold"""
+        if embedding is None or not self.enabled:
+            return None
+        try:
+            row = await asyncio.to_thread(self._lookup, embedding, language)
+        except Exception as e:
+            logger.error(f"Error reading semantic cache: {e}")
+            return None
+
+        if row and row[1] < self.max_distance:
+            logger.info("Semantic cache hit (distance %.4f)", row[1])
+            return row[0]
+        return None
+
+    def _lookup(self, embedding: bytes, language: str):
+        with self._lock:
+            return self.conn.execute(
+                """
+                SELECT response, vec_distance_cosine(embedding, ?) AS distance
+                FROM response_cache
+                WHERE language = ? AND expires_at > ?
+                ORDER BY distance
+                LIMIT 1
+                """,
+                (embedding, language, time.time())
+            ).fetchone()
+
+    async def store(self, query: str, embedding: Optional[bytes], response: str, language: str):
+        """Store a generated response under its query embedding"""
+        if embedding is None or not self.enabled:
+            return
+        try:
+            await asyncio.to_thread(self._store, query, embedding, response, language)
+        except Exception as e:
+            logger.error(f"Error writing semantic cache: {e}")
+
+    def _store(self, query: str, embedding: bytes, response: str, language: str):
+        now = time.time()
+        with self._lock:
+            self.conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+            self.conn.execute(
+                """
+                INSERT INTO response_cache (language, query, embedding, response, created_at, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (language, query, embedding, response, now, now + self.ttl_seconds)
+            )
+            # ids only grow, so everything this far below the newest row is the oldest overflow
+            self.conn.execute(
+                "DELETE FROM response_cache WHERE id <= (SELECT MAX(id) FROM response_cache) - ?",
+                (self.max_entries,)
+            )
+            self.conn.commit()
+
+    async def clear(self):
+        """Drop every cached response, e.g. after the restaurant data changed"""
+        if not self.enabled:
+            return
+        try:
+            await asyncio.to_thread(self._clear)
+            logger.info("Semantic cache cleared")
+        except Exception as e:
+            logger.error(f"Error clearing semantic cache: {e}")
+
+    def _clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM response_cache")
+            self.conn.commit()
+
+    def close(self):
+        """Close the cache database"""
+        if self.conn is not None:
+            with self._lock:
+                self.conn.close()
+            self.conn = None
@@ -1,27 +1,76 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse, ORJSONResponse
 from pydantic import BaseModel
 from typing import Optional, List
+from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 import uuid
+import json
+import asyncio
 from datetime import datetime
 import logging
+import time
 
-from ai_init import ChatbotAI
+from ai_init import ChatbotAI, FALLBACK_RESPONSES, ERROR_RESPONSE_MESSAGE
 from vector_db import VectorDatabase
+from semantic_cache import SemanticCache
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging (set LOG_LEVEL=WARNING in production to skip per-request logs)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
 logger = logging.getLogger(__name__)
 
+# Initialize components
+chatbot_ai = ChatbotAI()
+vector_db = VectorDatabase()
+semantic_cache = SemanticCache()
+
+# Strong references to fire-and-forget tasks so they are not garbage collected mid-flight
+background_tasks = set()
+
+def run_in_background(coro):
+    """Schedule a coroutine without making the client wait for it"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(_on_background_task_done)
+
+def _on_background_task_done(task: asyncio.Task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background task failed: {task.exception()}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize database connections and vector store, then release them on shutdown"""
+    try:
+        await chatbot_ai.initialize()
+        await vector_db.initialize()
+        await semantic_cache.initialize()
+        logger.info("Chatbot backend initialized successfully")
+    except Exception as e:
+        logger.error(f"Failed to initialize chatbot backend: {e}")
+        raise
+    
+    yield
+    
+    # Let pending writes (chat history, cache inserts) finish before closing
+    if background_tasks:
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+    await chatbot_ai.close()
+    semantic_cache.close()
+    vector_db.close()
+
 app = FastAPI(
     title="Restaurant Chatbot API",
     description="A chatbot backend service for restaurant-specific assistance",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -33,6 +82,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class SelectiveGZipMiddleware:
+    """GZip responses except on paths that must stream unbuffered, such as SSE"""
+    
+    def __init__(self, app, exclude_paths=(), **gzip_options):
+        self.app = app
+        self.gzip_app = GZipMiddleware(app, **gzip_options)
+        self.exclude_paths = frozenset(exclude_paths)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] not in self.exclude_paths:
+            await self.gzip_app(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+# Compress larger JSON bodies (LLM text); the SSE stream must reach clients chunk by chunk
+app.add_middleware(
+    SelectiveGZipMiddleware,
+    exclude_paths={"/chat/stream"},
+    minimum_size=1024,
+    compresslevel=5
+)
+
 # Request/Response models
 class ChatRequest(BaseModel):
     Language: str = "en"
@@ -44,20 +115,50 @@ class ChatResponse(BaseModel):
     session_id: str
     timestamp: str
 
-# Initialize components
-chatbot_ai = ChatbotAI()
-vector_db = VectorDatabase()
+# The /summary analysis is much longer than a chat reply (the cap includes Gemini's thinking tokens)
+SUMMARY_MAX_OUTPUT_TOKENS = 16384
+
+# Last formatted second, reused by iso_now() within the same second
+_iso_cache = [0, ""]
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database connections and vector store"""
+async def lookup_cached_response(request: ChatRequest):
+    """Embed the query locally and look it up in the semantic cache; returns (embedding, cached text)"""
+    query_embedding = await semantic_cache.embed(request.Query)
+    cached_text = await semantic_cache.lookup(query_embedding, request.Language)
+    return query_embedding, cached_text
+
+async def gather_chat_inputs(request: ChatRequest):
+    """Fetch history, cached answer and relevant context
+    
+    Returns (history, context, query_embedding, cached_text). Follow-ups depend on
+    conversation context, so only fresh sessions are served from or stored in the
+    semantic cache. The Pinecone search runs in the background meanwhile and is
+    abandoned on a cache hit rather than awaited.
+    """
+    search_task = asyncio.create_task(vector_db.search_relevant_content(
+        query=request.Query,
+        language=request.Language
+    ))
     try:
-        await chatbot_ai.initialize()
-        await vector_db.initialize()
-        logger.info("Chatbot backend initialized successfully")
-    except Exception as e:
-        logger.error(f"Failed to initialize chatbot backend: {e}")
+        history = await chatbot_ai.get_chat_history(request.Session_ID)
+        if history:
+            return history, await search_task, None, None
+        query_embedding, cached_text = await lookup_cached_response(request)
+    except BaseException:
+        search_task.cancel()
         raise
+    
+    if cached_text is not None:
+        search_task.cancel()
+        return history, [], query_embedding, cached_text
+    return history, await search_task, query_embedding, None
+
+def iso_now() -> str:
+    """Current UTC time as an ISO 8601 string, formatted at most once per second"""
+    now = int(time.time())
+    if now != _iso_cache[0]:
+        _iso_cache[:] = [now, datetime.utcfromtimestamp(now).isoformat()]
+    return _iso_cache[1]
 
 @app.get("/")
 async def root():
@@ -69,7 +170,7 @@ async def health_check():
     """Detailed health check"""
     return {
         "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": iso_now(),
         "services": {
             "supabase": await chatbot_ai.check_database_connection(),
             "pinecone": await vector_db.check_connection(),
@@ -89,37 +190,38 @@ async def chat(request: ChatRequest):
         ChatResponse with the chatbot's response
     """
     try:
-        logger.info(f"Received chat request for session {request.Session_ID}")
+        logger.info("Received chat request for session %s", request.Session_ID)
         
-        # Get conversation history
-        history = await chatbot_ai.get_chat_history(request.Session_ID)
+        # Near-duplicate questions are served from the semantic cache
+        history, context, query_embedding, response_text = await gather_chat_inputs(request)
         
-        # Get relevant context from vector database
-        context = await vector_db.search_relevant_content(
-            query=request.Query,
-            language=request.Language
-        )
+        if response_text is None:
+            # Generate response using Gemini API
+            response_text = await chatbot_ai.generate_response(
+                query=request.Query,
+                language=request.Language,
+                context=context,
+                history=history
+            )
+            
+            if response_text not in FALLBACK_RESPONSES:
+                run_in_background(semantic_cache.store(
+                    request.Query, query_embedding, response_text,
+                    request.Language
+                ))
         
-        # Generate response using Gemini API
-        response_text = await chatbot_ai.generate_response(
-            query=request.Query,
-            language=request.Language,
-            context=context,
-            history=history
-        )
-        
-        # Store the interaction in database
-        await chatbot_ai.store_interaction(
+        # Store the interaction in database without blocking the response
+        run_in_background(chatbot_ai.store_interaction(
             session_id=request.Session_ID,
             query=request.Query,
             response=response_text,
             language=request.Language
-        )
+        ))
         
         return ChatResponse(
             response=response_text,
             session_id=request.Session_ID,
-            timestamp=datetime.utcnow().isoformat()
+            timestamp=iso_now()
         )
         
     except Exception as e:
@@ -127,6 +229,69 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming variant of /chat using server-sent events
+    
+    Each event carries a JSON object: {"text": ...} for response chunks,
+    {"error": ...} if generation fails after partial output, and a final
+    {"done": true, "session_id": ..., "timestamp": ...}.
+    """
+    try:
+        logger.info("Received streaming chat request for session %s", request.Session_ID)
+        
+        history, context, query_embedding, cached_text = await gather_chat_inputs(request)
+    except Exception as e:
+        logger.error(f"Error preparing streaming chat request: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    
+    async def event_stream():
+        truncated = False
+        if cached_text is not None:
+            chunks = [cached_text]
+            yield f"data: {json.dumps({'text': cached_text})}\n\n"
+        else:
+            # Buffer chunks so the full response can be stored once streaming ends
+            chunks = []
+            try:
+                async for text in chatbot_ai.generate_response_stream(
+                    query=request.Query,
+                    language=request.Language,
+                    context=context,
+                    history=history
+                ):
+                    chunks.append(text)
+                    yield f"data: {json.dumps({'text': text})}\n\n"
+            except Exception:
+                # Gemini failed mid-answer; the client already shows the partial text
+                truncated = True
+                yield f"data: {json.dumps({'error': ERROR_RESPONSE_MESSAGE})}\n\n"
+        
+        response_text = "".join(chunks).strip()
+        
+        # Store before the final event: clients that close on `done` cancel this generator
+        if cached_text is None and not truncated and response_text not in FALLBACK_RESPONSES:
+            run_in_background(semantic_cache.store(
+                request.Query, query_embedding, response_text,
+                request.Language, request.Session_ID
+            ))
+        run_in_background(chatbot_ai.store_interaction(
+            session_id=request.Session_ID,
+            query=request.Query,
+            response=response_text,
+            language=request.Language
+        ))
+        
+        yield f"data: {json.dumps({'done': True, 'session_id': request.Session_ID, 'timestamp': iso_now()})}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/updatedb")
 async def update_database():
     """Sync Supabase menu_items and restaurant_details to Pinecone vector DB."""
@@ -137,7 +302,13 @@ async def update_database():
         if not hasattr(vector_db, 'index') or vector_db.index is None:
             await vector_db.initialize()
         
+        content_version = vector_db.content_version
         result = await vector_db.sync_supabase_to_pinecone(chatbot_ai.supabase)
+        # Menu or details changed, so stored summaries are stale
+        chatbot_ai.invalidate_summary_cache()
+        if vector_db.content_version != content_version:
+            # Cached answers may quote old prices or dishes
+            await semantic_cache.clear()
         if result:
             return {"status": "success", "message": "Database synced to Pinecone."}
         else:
@@ -156,10 +327,14 @@ async def get_summary(language: str):
         if not hasattr(vector_db, 'index') or vector_db.index is None:
             await vector_db.initialize()
 
+        cached_summary = chatbot_ai.get_cached_summary(language)
+        if cached_summary is not None:
+            return {"summary": cached_summary}
+
         # Fetch all menu items and restaurant details from Supabase
-        menu_resp = chatbot_ai.supabase.table('menu_items').select('*').execute()
+        menu_resp = await chatbot_ai.execute(chatbot_ai.supabase.table('menu_items').select('name,price,description'))
         menu_items = menu_resp.data if hasattr(menu_resp, 'data') else menu_resp.get('data', [])
-        details_resp = chatbot_ai.supabase.table('restaurant_details').select('*').execute()
+        details_resp = await chatbot_ai.execute(chatbot_ai.supabase.table('restaurant_details').select('details,description'))
         restaurant_details = details_resp.data if hasattr(details_resp, 'data') else details_resp.get('data', [])
 
         # Compose a summary prompt for the LLM
@@ -192,8 +367,12 @@ Menu Items ({menu_count}):\n{menu_text}\n\nRestaurant Details ({details_count}):
             query="Summarize and suggest improvements for the restaurant based on the data above.",
             language=language,
             context=[prompt],
-            history=[]
+            history=[],
+            # The summary prompt carries the whole menu and must not be cut
+            max_knowledge_chars=None,
+            max_output_tokens=SUMMARY_MAX_OUTPUT_TOKENS
         )
+        chatbot_ai.cache_summary(language, summary)
         return {"summary": summary}
     except Exception as e:
         logger.error(f"Error generating summary: {e}")
@@ -1,15 +1,75 @@
 import os
+import json
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import asyncio
+import hashlib
+import time
+import heapq
+from operator import itemgetter
+from collections import OrderedDict
 
 # Third-party imports
+import numpy as np
 import pinecone
 from pinecone import Pinecone, ServerlessSpec
 import google.generativeai as genai
 
+from ai_init import retry_db_operation
+from embedding_store import EmbeddingStore, quantize, dequantize
+
 logger = logging.getLogger(__name__)
 
+EMBEDDING_MODEL = "models/text-embedding-004"
+EMBEDDING_TASK_TYPE = "retrieval_document"
+
+# Input cap for text-embedding-004 (limit is 2048 tokens), with headroom for tokenizer differences
+MAX_EMBEDDING_TOKENS = 2000
+# Character cap used instead when the tokenizer cannot be loaded (e.g. offline containers)
+MAX_EMBEDDING_CHARS = 8000
+
+# Texts per embed_content batch request (API limit is 100)
+EMBEDDING_BATCH_SIZE = 100
+
+# Concurrent Pinecone upsert requests while indexing, to respect rate limits
+UPSERT_CONCURRENCY = 4
+
+# IDs and metadata sources of chunks synced from Supabase
+SUPABASE_DOC_PREFIX = "doc_supabase_"
+SUPABASE_SOURCES = ("supabase_menu_items", "supabase_restaurant_details")
+
+# Per-table row counts and newest updated_at seen by the last successful Supabase sync
+SYNC_STATE_PATH = os.getenv("PINECONE_SYNC_STATE_PATH", ".pinecone_sync_state.json")
+SYNC_TABLES = ("menu_items", "restaurant_details")
+
+# Longest wait for a newly created index to become ready
+INDEX_READY_TIMEOUT_SECONDS = 30
+
+# check_connection trusts a successful list_indexes call for this long
+CONNECTION_CHECK_TTL_SECONDS = 30
+
+# Search results reused for semantically equivalent queries (cosine similarity of raw query embeddings)
+SEARCH_CACHE_MIN_SIMILARITY = 0.95
+SEARCH_CACHE_TTL_SECONDS = 600
+SEARCH_CACHE_SIZE = 1024
+
+# Embeddings kept in memory (least recently used evicted); repeat queries skip the API call
+EMBEDDING_CACHE_SIZE = 4096
+
+# Words dropped when extracting key terms from a query
+_STOPWORDS: frozenset = frozenset({'how', 'much', 'does', 'the', 'cost', 'what', 'price'})
+# Substrings marking a pricing question
+_PRICING_KEYWORDS: frozenset = frozenset({'cost', 'price', 'much', 'expensive'})
+
+def _load_token_encoder():
+    """cl100k_base BPE encoder, approximating Gemini's tokenizer; may download its vocabulary"""
+    import tiktoken
+    return tiktoken.get_encoding("cl100k_base")
+
+def content_hash(text: str) -> str:
+    """Stable 128-bit content digest; unlike hash(), identical across processes and restarts"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
 class VectorDatabase:
     """Handles Pinecone vector database operations for RAG functionality"""
     
@@ -18,9 +78,33 @@ class VectorDatabase:
         self.index = None
         self.index_name = os.getenv("PINECONE_INDEX_NAME")
         self.embedding_model = None
+        self._token_encoder = None
+        # Embeddings are held int8-quantized as (vector, scale) to cut memory 4x
+        self._emb_cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._emb_locks: Dict[str, asyncio.Lock] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # On-disk second tier behind the LRU, so restarts do not re-embed everything
+        self.embedding_store = EmbeddingStore()
+        # Search result cache: key -> (unit query vector, language, top_k, results, timestamp),
+        # with _search_matrix rows aligned to _search_keys for one matmul per lookup
+        self._search_cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._search_keys: List[str] = []
+        self._search_matrix: Optional[np.ndarray] = None
+        self._last_ok_ts = float("-inf")
+        # Bumped whenever indexed content changes, so callers can tell whether their derived caches are stale
+        self.content_version = 0
         
     async def initialize(self):
         """Initialize Pinecone client and index"""
+        if not self.embedding_store.enabled:
+            await self.embedding_store.initialize()
+        if self._token_encoder is None:
+            try:
+                self._token_encoder = await asyncio.to_thread(_load_token_encoder)
+            except Exception as e:
+                logger.warning(f"Tokenizer unavailable, truncating embedding input by characters: {e}")
+        
         try:
             # Initialize Pinecone
             api_key = os.getenv("PINECONE_API_KEY")
@@ -33,7 +117,7 @@ class VectorDatabase:
             await self._ensure_index_exists()
             
             # Get the index
-            self.index = self.pc.Index(self.index_name)
+            self.index = await self._run(self.pc.Index, self.index_name)
             
             # Initialize Google Generative AI for embeddings
             gemini_api_key = os.getenv("GEMINI_API_KEY")
@@ -47,14 +131,24 @@ class VectorDatabase:
             logger.error(f"Failed to initialize VectorDatabase: {e}")
             raise
     
+    def close(self):
+        """Flush pending embedding writes and close the on-disk store"""
+        self.embedding_store.close()
+    
+    async def _run(self, fn, *args, **kwargs):
+        """Run a blocking Pinecone (or other SDK) call on a worker thread so the event loop stays free"""
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    
     async def _ensure_index_exists(self):
         """Create index if it doesn't exist"""
         try:
-            existing_indexes = [index.name for index in self.pc.list_indexes()]
+            existing_indexes = [index.name for index in await self._run(self.pc.list_indexes)]
+            self._last_ok_ts = time.monotonic()
             
             if self.index_name not in existing_indexes:
                 logger.info(f"Creating new Pinecone index: {self.index_name}")
-                self.pc.create_index(
+                await self._run(
+                    self.pc.create_index,
                     name=self.index_name,
                     dimension=768,  # Google's text-embedding-004 dimension
                     metric="cosine",
@@ -63,8 +157,7 @@ class VectorDatabase:
                         region="us-east-1"
                     )
                 )
-                # Wait for index to be ready
-                await asyncio.sleep(10)
+                await self._wait_for_index_ready()
             else:
                 logger.info(f"Using existing Pinecone index: {self.index_name}")
                 
@@ -72,6 +165,21 @@ class VectorDatabase:
             logger.error(f"Error ensuring index exists: {e}")
             raise
     
+    async def _wait_for_index_ready(self, timeout: float = INDEX_READY_TIMEOUT_SECONDS):
+        """Poll describe_index with exponential backoff until Pinecone reports the index ready"""
+        delay = 0.25
+        deadline = time.monotonic() + timeout
+        while True:
+            description = await self._run(self.pc.describe_index, self.index_name)
+            if description.status['ready']:
+                logger.info(f"Pinecone index {self.index_name} is ready")
+                return
+            if time.monotonic() + delay > deadline:
+                logger.warning(f"Pinecone index {self.index_name} not ready after {timeout:.0f}s, continuing")
+                return
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 2.0)
+    
     async def search_relevant_content(self, query: str, language: str = "en", top_k: int = 5) -> List[str]:
         """Search for relevant content based on query"""
         try:
@@ -79,79 +187,144 @@ class VectorDatabase:
                 logger.warning("Pinecone index not initialized")
                 return []
 
+            # Semantically equivalent recent queries reuse their results without any fan-out
+            query_embedding = await self._generate_embedding(query)
+            query_vector = None
+            if query_embedding:
+                query_vector = np.asarray(query_embedding, dtype=np.float32)
+                query_vector /= np.linalg.norm(query_vector) or 1.0
+                cached_results = self._lookup_search_cache(query_vector, language, top_k)
+                if cached_results is not None:
+                    logger.info("Search cache hit, reusing %d content pieces", len(cached_results))
+                    return cached_results
+            
             # Generate multiple query variations for better matching
             query_lower = query.lower()
             
             # Extract important terms
-            key_terms = []
-            for word in query_lower.split():
-                if len(word) > 2 and word not in ['how', 'much', 'does', 'the', 'cost', 'what', 'price']:
-                    key_terms.append(word)
-            
-            query_variations = [
-                query,
-                " ".join(key_terms),  # Key terms only
-                # Add restaurant-specific terms
-                f"ramen {' '.join(key_terms)}",
-                f"menu {' '.join(key_terms)}",
-                f"price {' '.join(key_terms)}"
-            ]
-            
-            # Special handling for pricing questions
-            if any(word in query_lower for word in ['cost', 'price', 'much', 'expensive']):
-                # Add specific menu item searches
-                if 'black garlic' in query_lower or 'garlic oil' in query_lower:
-                    query_variations.extend([
-                        "Black Garlic Oil Ramen",
-                        "Black Garlic Oil Ramen price",
-                        "1480 ramen"
-                    ])
-                elif 'ramen' in query_lower:
-                    query_variations.extend([
-                        "ramen price",
-                        "ramen menu",
-                        "ramen cost"
-                    ])
-            
-            logger.info(f"Search query variations: {query_variations}")
+            key_terms = [word for word in query_lower.split() if len(word) > 2 and word not in _STOPWORDS]
             
-            all_results = []
-            seen_content = set()  # To avoid duplicates
-            
-            for variation in query_variations:
-                # Generate embedding for the query variation
-                query_embedding = await self._generate_embedding(variation)
-                
-                if not query_embedding:
-                    continue
+            # Trivial queries ("hi", "ok thanks") have nothing to expand; every variation would be a bare prefix
+            if not key_terms and len(query.split()) <= 2:
+                query_variations = [query]
+            else:
+                query_variations = [
+                    query,
+                    " ".join(key_terms),  # Key terms only
+                    # Add restaurant-specific terms
+                    f"ramen {' '.join(key_terms)}",
+                    f"menu {' '.join(key_terms)}",
+                    f"price {' '.join(key_terms)}"
+                ]
                 
-                # Search in Pinecone with more results
-                search_results = self.index.query(
+                # Special handling for pricing questions
+                if any(word in query_lower for word in _PRICING_KEYWORDS):
+                    # Add specific menu item searches
+                    if 'black garlic' in query_lower or 'garlic oil' in query_lower:
+                        query_variations.extend([
+                            "Black Garlic Oil Ramen",
+                            "Black Garlic Oil Ramen price",
+                            "1480 ramen"
+                        ])
+                    elif 'ramen' in query_lower:
+                        query_variations.extend([
+                            "ramen price",
+                            "ramen menu",
+                            "ramen cost"
+                        ])
+            
+            # Identical variations (e.g. key terms equal to the query) would repeat the same calls; empty ones are useless
+            query_variations = list(dict.fromkeys(filter(None, (variation.strip() for variation in query_variations))))
+            logger.debug("Search query variations: %s", query_variations)
+            
+            async def embed_variation(variation: str) -> Optional[List[float]]:
+                # The raw query was already embedded for the search cache lookup
+                if query_embedding and variation == query.strip():
+                    return query_embedding
+                return await self._generate_embedding(variation)
+            
+            # Embed all variations concurrently, then run their Pinecone queries concurrently
+            embeddings = await asyncio.gather(*[embed_variation(variation) for variation in query_variations])
+            search_filter = {"language": language} if language else None
+            search_results_list = await asyncio.gather(*[
+                self._run(
+                    self.index.query,
                     vector=query_embedding,
-                    top_k=top_k * 2,  # Get more results to increase chances
+                    top_k=top_k,
                     include_metadata=True,
-                    filter={"language": language} if language else None
+                    filter=search_filter
                 )
-                
+                for query_embedding in embeddings if query_embedding
+            ])
+            
+            all_results = []
+            seen = set()  # To avoid duplicates
+            
+            for search_results in search_results_list:
                 # Extract relevant content with very low threshold
                 for match in search_results.matches:
                     if match.score > 0.005:  # Very low threshold for hash-based embeddings
                         content = match.metadata.get('content', '')
-                        if content and content not in seen_content:
+                        # Older vectors predate the content_hash metadata field
+                        dedup_key = match.metadata.get('content_hash') or content
+                        if content and dedup_key not in seen:
                             all_results.append((match.score, content))
-                            seen_content.add(content)
+                            seen.add(dedup_key)
             
-            # Sort by score and take top results
-            all_results.sort(reverse=True, key=lambda x: x[0])
-            relevant_content = [content for score, content in all_results[:top_k]]
+            # Take the top results by score
+            relevant_content = [content for _, content in heapq.nlargest(top_k, all_results, key=itemgetter(0))]
             
-            logger.info(f"Found {len(relevant_content)} relevant content pieces for query")
+            logger.info("Found %d relevant content pieces for query", len(relevant_content))
+            if query_vector is not None and relevant_content:
+                self._store_search_cache(query, query_vector, language, top_k, relevant_content)
             return relevant_content
             
         except Exception as e:
             logger.error(f"Error searching relevant content: {e}")
             return []
     
+    def _lookup_search_cache(self, query_vector: np.ndarray, language: str, top_k: int) -> Optional[List[str]]:
+        """Return cached results of the most similar fresh query above the similarity threshold"""
+        if self._search_matrix is None:
+            return None
+        
+        similarities = self._search_matrix @ query_vector
+        now = time.monotonic()
+        for row in np.argsort(similarities)[::-1]:
+            if similarities[row] < SEARCH_CACHE_MIN_SIMILARITY:
+                break
+            key = self._search_keys[row]
+            _, cached_language, cached_top_k, results, timestamp = self._search_cache[key]
+            if cached_language == language and cached_top_k == top_k and now - timestamp < SEARCH_CACHE_TTL_SECONDS:
+                self._search_cache.move_to_end(key)
+                return list(results)
+        return None
+    
+    def _store_search_cache(self, query: str, query_vector: np.ndarray, language: str, top_k: int, results: List[str]):
+        key = f"{language}\x00{top_k}\x00{query}"
+        self._search_cache[key] = (query_vector, language, top_k, list(results), time.monotonic())
+        self._search_cache.move_to_end(key)
+        
+        # Evict expired entries, then least recently used ones beyond capacity
+        now = time.monotonic()
+        for stale_key in [k for k, entry in self._search_cache.items() if now - entry[4] >= SEARCH_CACHE_TTL_SECONDS]:
+            del self._search_cache[stale_key]
+        while len(self._search_cache) > SEARCH_CACHE_SIZE:
+            self._search_cache.popitem(last=False)
+        self._rebuild_search_matrix()
+    
+    def _rebuild_search_matrix(self):
+        self._search_keys = list(self._search_cache)
+        self._search_matrix = (
+            np.stack([entry[0] for entry in self._search_cache.values()]) if self._search_cache else None
+        )
+    
+    def _clear_search_cache(self):
+        """Forget cached search results after the indexed content changed"""
+        self.content_version += 1
+        self._search_cache.clear()
+        self._rebuild_search_matrix()
+    
     async def add_document(self, content: str, metadata: Dict[str, Any]) -> bool:
         """Add a document to the vector database"""
         try:
@@ -165,18 +338,20 @@ class VectorDatabase:
                 return False
             
             # Create unique ID for the document
-            doc_id = f"doc_{hash(content)}_{metadata.get('language', 'en')}"
+            doc_id = f"doc_{content_hash(content)}_{metadata.get('language', 'en')}"
             
             # Prepare metadata
             full_metadata = {
                 "content": content,
+                "content_hash": content_hash(content),
                 "timestamp": metadata.get("timestamp", ""),
                 "language": metadata.get("language", "en"),
                 "document_type": metadata.get("document_type", "general")
             }
             
             # Upsert to Pinecone
-            self.index.upsert([(doc_id, embedding, full_metadata)])
+            await self._run(self.index.upsert, [(doc_id, embedding, full_metadata)])
+            self._clear_search_cache()
             
             logger.info(f"Added document to vector database: {doc_id}")
             return True
@@ -187,20 +362,25 @@ class VectorDatabase:
     
     async def add_documents(self, texts: List[str], metadatas: List[Dict[str, Any]]) -> bool:
         """Add multiple documents to the vector database (for PDF upload)"""
+        return await self._upsert_documents(texts, metadatas) > 0
+
+    async def _upsert_documents(self, texts: List[str], metadatas: List[Dict[str, Any]]) -> int:
+        """Embed and upsert documents, returning how many reached Pinecone; chunks that fail to embed are skipped"""
         try:
             if not self.index:
                 logger.warning("Pinecone index not initialized")
-                return False
+                return 0
             
             if len(texts) != len(metadatas):
                 logger.error("Number of texts and metadatas must match")
-                return False
+                return 0
             
             vectors_to_upsert = []
             
-            for i, (text, metadata) in enumerate(zip(texts, metadatas)):
-                # Generate embedding
-                embedding = await self._generate_embedding(text)
+            # Embed all chunks with as few API calls as possible
+            embeddings = await self._generate_embeddings_batch(texts)
+            
+            for i, (text, metadata, embedding) in enumerate(zip(texts, metadatas, embeddings)):
                 if not embedding:
                     logger.warning(f"Failed to generate embedding for text {i}")
                     continue
@@ -208,11 +388,12 @@ class VectorDatabase:
                 # Create unique ID for the document
                 source = metadata.get('source', 'unknown')
                 chunk_index = metadata.get('chunk_index', i)
-                doc_id = f"doc_{source}_{chunk_index}_{hash(text[:100])}"
+                doc_id = self._document_id(text, metadata, i)
                 
                 # Prepare metadata
                 full_metadata = {
                     "content": text,
+                    "content_hash": content_hash(text),
                     "source": source,
                     "document_type": metadata.get("document_type", "general"),
                     "language": metadata.get("language", "en"),
@@ -225,42 +406,155 @@ class VectorDatabase:
                 vectors_to_upsert.append((doc_id, embedding, full_metadata))
             
             if vectors_to_upsert:
-                # Upsert in batches (Pinecone recommends batches of 100)
+                # Upsert in batches (Pinecone recommends batches of 100), a few at a time
                 batch_size = 100
-                for i in range(0, len(vectors_to_upsert), batch_size):
-                    batch = vectors_to_upsert[i:i + batch_size]
-                    self.index.upsert(batch)
-                    logger.info(f"Uploaded batch {i//batch_size + 1} with {len(batch)} vectors")
+                batches = [vectors_to_upsert[i:i + batch_size] for i in range(0, len(vectors_to_upsert), batch_size)]
+                upsert_slots = asyncio.Semaphore(UPSERT_CONCURRENCY)
+                
+                async def upsert_batch(number: int, batch):
+                    async with upsert_slots:
+                        await self._run(self.index.upsert, batch)
+                    logger.info(f"Uploaded batch {number} with {len(batch)} vectors")
+                
+                await asyncio.gather(*(upsert_batch(n, batch) for n, batch in enumerate(batches, start=1)))
+                self._clear_search_cache()
                 
                 logger.info(f"Successfully added {len(vectors_to_upsert)} documents to vector database")
-                return True
+                return len(vectors_to_upsert)
             else:
                 logger.error("No valid embeddings generated")
-                return False
+                return 0
             
         except Exception as e:
             logger.error(f"Error adding documents to vector database: {e}")
-            return False
+            return 0
+
+    def _document_id(self, text: str, metadata: Dict[str, Any], position: int) -> str:
+        """ID of a chunk added through add_documents"""
+        source = metadata.get('source', 'unknown')
+        chunk_index = metadata.get('chunk_index', position)
+        return f"doc_{source}_{chunk_index}_{content_hash(text[:100])}"
 
     async def _generate_embedding(self, text: str) -> Optional[List[float]]:
-        """Generate embedding for text using Google's Text Embedding API"""
+        """Generate embedding for text using Google's Text Embedding API, served from the LRU cache when possible"""
+        text = self._prepare_embedding_text(text)
+        if text is None:
+            return None
+        
+        key = self._embedding_cache_key(text)
+        embedding = self._get_cached_embedding(key)
+        if embedding is not None:
+            return embedding
+        
+        # One API call per key: concurrent callers for the same text wait for the first
+        lock = self._emb_locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                embedding = self._get_cached_embedding(key)
+                if embedding is not None:
+                    return embedding
+                
+                stored = await self.embedding_store.get(key)
+                if stored is not None:
+                    self._put_cached_embedding(key, stored)
+                    return dequantize(*stored)
+                
+                self.cache_misses += 1
+                embedding = await self._embed_text(text)
+                # Failures return None and are never cached
+                if embedding is not None:
+                    quantized = quantize(embedding)
+                    self._put_cached_embedding(key, quantized)
+                    self.embedding_store.put(key, EMBEDDING_MODEL, quantized)
+                return embedding
+        finally:
+            if not lock.locked() and self._emb_locks.get(key) is lock:
+                del self._emb_locks[key]
+    
+    async def _generate_embeddings_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Generate embeddings for many texts, sending cache misses to the API in batches"""
+        prepared = [self._prepare_embedding_text(text) for text in texts]
+        keys = [self._embedding_cache_key(text) if text is not None else None for text in prepared]
+        
+        # Serve cached texts and collect the distinct ones that still need the API
+        found: Dict[str, List[float]] = {}
+        missing: Dict[str, str] = {}
+        for text, key in zip(prepared, keys):
+            if key is None or key in found or key in missing:
+                continue
+            embedding = self._get_cached_embedding(key)
+            if embedding is not None:
+                found[key] = embedding
+            else:
+                missing[key] = text
+        
+        stored = await self.embedding_store.get_many(list(missing))
+        for key, quantized in stored.items():
+            found[key] = dequantize(*quantized)
+            self._put_cached_embedding(key, quantized)
+            del missing[key]
+        
+        missing_items = list(missing.items())
+        for start in range(0, len(missing_items), EMBEDDING_BATCH_SIZE):
+            batch = missing_items[start:start + EMBEDDING_BATCH_SIZE]
+            self.cache_misses += len(batch)
+            embeddings = await self._embed_texts([text for _, text in batch])
+            for (key, _), embedding in zip(batch, embeddings):
+                if embedding is not None:
+                    found[key] = embedding
+                    quantized = quantize(embedding)
+                    self._put_cached_embedding(key, quantized)
+                    self.embedding_store.put(key, EMBEDDING_MODEL, quantized)
+        
+        return [found.get(key) if key is not None else None for key in keys]
+    
+    def _prepare_embedding_text(self, text: str) -> Optional[str]:
+        """Clean and truncate text before embedding; None if nothing is left"""
+        text = text.strip()
+        if not text:
+            logger.warning("Empty text provided for embedding")
+            return None
+        
+        # Truncate by tokens, not characters: multi-byte scripts hit the 2048-token limit long before 8000 chars.
+        # A BPE token covers at least one UTF-8 byte, so short texts skip tokenization entirely
+        if self._token_encoder is None:
+            if len(text) > MAX_EMBEDDING_CHARS:
+                text = text[:MAX_EMBEDDING_CHARS]
+                logger.warning(f"Text truncated to {MAX_EMBEDDING_CHARS} characters for embedding")
+        elif len(text.encode("utf-8")) > MAX_EMBEDDING_TOKENS:
+            tokens = self._token_encoder.encode(text)
+            if len(tokens) > MAX_EMBEDDING_TOKENS:
+                text = self._token_encoder.decode(tokens[:MAX_EMBEDDING_TOKENS])
+                logger.warning(f"Text truncated from {len(tokens)} to {MAX_EMBEDDING_TOKENS} tokens for embedding")
+        return text
+    
+    def _embedding_cache_key(self, text: str) -> str:
+        return hashlib.sha256(f"{EMBEDDING_MODEL}\x00{EMBEDDING_TASK_TYPE}\x00{text}".encode("utf-8")).hexdigest()
+    
+    def _put_cached_embedding(self, key: str, quantized: tuple):
+        self._emb_cache[key] = quantized
+        self._emb_cache.move_to_end(key)
+        if len(self._emb_cache) > EMBEDDING_CACHE_SIZE:
+            self._emb_cache.popitem(last=False)
+    
+    def _get_cached_embedding(self, key: str) -> Optional[List[float]]:
+        quantized = self._emb_cache.get(key)
+        if quantized is None:
+            return None
+        self._emb_cache.move_to_end(key)
+        self.cache_hits += 1
+        return dequantize(*quantized)
+    
+    async def _embed_text(self, text: str) -> Optional[List[float]]:
+        """Call the embedding API for a single prepared text"""
         try:
-            # Clean and prepare text for embedding
-            text = text.strip()
-            if not text:
-                logger.warning("Empty text provided for embedding")
-                return None
-            
-            # Truncate text if too long (Google has token limits)
-            if len(text) > 8000:  # Conservative limit
-                text = text[:8000]
-                logger.warning("Text truncated to 8000 characters for embedding")
-            
             # Use Google's text embedding model
-            result = genai.embed_content(
-                model="models/text-embedding-004",
+            # embed_content is a blocking HTTP call; run it on a worker thread so calls can overlap
+            result = await self._run(
+                genai.embed_content,
+                model=EMBEDDING_MODEL,
                 content=text,
-                task_type="retrieval_document",  # Optimized for document retrieval
+                task_type=EMBEDDING_TASK_TYPE,  # Optimized for document retrieval
                 title="Restaurant Document"  # Optional title for better context
             )
             
@@ -272,7 +566,7 @@ class VectorDatabase:
                 logger.error(f"Unexpected embedding dimension: {len(embedding)}, expected 768")
                 return None
             
-            logger.debug(f"Generated embedding for text: {text[:50]}...")
+            logger.debug("Generated embedding for text: %.50s...", text)
             return embedding
             
         except Exception as e:
@@ -280,7 +574,32 @@ class VectorDatabase:
             # Return None to allow fallback behavior
             return None
 
-    
+    async def _embed_texts(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Call the embedding API once for a batch of prepared texts"""
+        try:
+            # A list of contents is embedded in a single batch request
+            result = await self._run(
+                genai.embed_content,
+                model=EMBEDDING_MODEL,
+                content=texts,
+                task_type=EMBEDDING_TASK_TYPE,
+                title="Restaurant Document"
+            )
+            
+            embeddings = []
+            for embedding in result['embedding']:
+                if len(embedding) != 768:
+                    logger.error(f"Unexpected embedding dimension: {len(embedding)}, expected 768")
+                    embeddings.append(None)
+                else:
+                    embeddings.append(embedding)
+            
+            logger.debug("Generated %d embeddings in one batch", len(embeddings))
+            return embeddings
+            
+        except Exception as e:
+            logger.error(f"Error generating Google embeddings batch: {e}")
+            return [None] * len(texts)
 
     async def get_index_stats(self) -> Dict[str, Any]:
         """Get statistics about the index"""
@@ -288,7 +607,7 @@ class VectorDatabase:
             if not self.index:
                 return {}
             
-            stats = self.index.describe_index_stats()
+            stats = await self._run(self.index.describe_index_stats)
             return {
                 "total_vectors": stats.total_vector_count,
                 "dimension": stats.dimension,
@@ -305,8 +624,13 @@ class VectorDatabase:
             if not self.pc:
                 return False
             
+            # A recent successful control-plane call is proof enough for health probes
+            if time.monotonic() - self._last_ok_ts < CONNECTION_CHECK_TTL_SECONDS:
+                return True
+            
             # Try to list indexes
-            indexes = self.pc.list_indexes()
+            indexes = await self._run(self.pc.list_indexes)
+            self._last_ok_ts = time.monotonic()
             return True
             
         except Exception as e:
@@ -321,25 +645,129 @@ class VectorDatabase:
             if not self.index:
                 logger.warning("Pinecone index not initialized")
                 return False
-            self.index.delete(delete_all=True, namespace="__default__")
+            await self._run(self.index.delete, delete_all=True, namespace="__default__")
+            self._clear_search_cache()
+            # The next sync must re-upload everything, whatever the tables' version
+            await asyncio.to_thread(self._save_sync_state, {})
             logger.info("All vectors in '__default__' namespace have been deleted.")
             return True
         except Exception as e:
             logger.error(f"Error resetting Pinecone index: {e}")
             return False
 
+    async def _fetch_content_hashes(self, doc_ids: List[str]) -> Dict[str, str]:
+        """Map each existing vector ID to the content_hash stored in its metadata"""
+        hashes = {}
+        for i in range(0, len(doc_ids), 100):
+            response = await self._run(self.index.fetch, ids=doc_ids[i:i + 100])
+            for doc_id, vector in response.vectors.items():
+                hashes[doc_id] = (vector.metadata or {}).get("content_hash")
+        return hashes
+
+    async def _list_ids(self, prefix: str) -> List[str]:
+        """List all vector IDs starting with prefix"""
+        # list() pages lazily over HTTP, so the whole iteration runs on the worker thread
+        return await self._run(
+            lambda: [doc_id for page in self.index.list(prefix=prefix) for doc_id in page]
+        )
+
+    def _load_sync_state(self) -> Dict[str, Any]:
+        try:
+            with open(SYNC_STATE_PATH) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable sync state {SYNC_STATE_PATH}: {e}")
+            return {}
+
+    def _save_sync_state(self, state: Dict[str, Any]):
+        try:
+            with open(SYNC_STATE_PATH, "w") as f:
+                json.dump(state, f)
+        except Exception as e:
+            logger.warning(f"Could not save sync state {SYNC_STATE_PATH}: {e}")
+
+    async def _probe_table(self, supabase_client, table: str, since: Optional[str]) -> Tuple[int, Optional[str]]:
+        """Row count of a table and its newest updated_at later than since (None if no row changed)"""
+        count_resp, newest_resp = await asyncio.gather(
+            retry_db_operation(lambda: asyncio.to_thread(
+                supabase_client.table(table).select('id', count='exact').limit(1).execute
+            )),
+            retry_db_operation(lambda: asyncio.to_thread(
+                supabase_client.table(table).select('updated_at')
+                .gt('updated_at', since or '-infinity')
+                .order('updated_at', desc=True).limit(1).execute
+            ))
+        )
+        return count_resp.count, (newest_resp.data[0]['updated_at'] if newest_resp.data else None)
+
+    async def _probe_sync_state(self, supabase_client, state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Current row count and newest updated_at per table, flagged when changed since state; None if the probe fails"""
+        try:
+            tables = state.get("tables", {})
+            probes = await asyncio.gather(*[
+                self._probe_table(supabase_client, table, tables.get(table, {}).get("last_sync_ts"))
+                for table in SYNC_TABLES
+            ])
+        except Exception as e:
+            logger.warning(f"Supabase version probe failed, running a full sync: {e}")
+            return None
+
+        probed = {}
+        for table, (row_count, newest) in zip(SYNC_TABLES, probes):
+            previous = tables.get(table, {})
+            probed[table] = {
+                "row_count": row_count,
+                "last_sync_ts": newest or previous.get("last_sync_ts"),
+                # Deletions only show up in the count; inserts and edits bump updated_at
+                "changed": previous.get("row_count") != row_count or newest is not None,
+            }
+        return probed
+
+    async def _record_sync_state(self, probed: Optional[Dict[str, Any]]):
+        """Persist the probed table versions once Pinecone reflects them"""
+        if probed is None:
+            return
+        await asyncio.to_thread(self._save_sync_state, {
+            "index": self.index_name,
+            "tables": {
+                table: {"row_count": info["row_count"], "last_sync_ts": info["last_sync_ts"]}
+                for table, info in probed.items()
+            }
+        })
+
+    async def _index_matches_sync_state(self, state: Dict[str, Any]) -> bool:
+        """Whether the saved sync state describes the current index"""
+        if state.get("index") != self.index_name:
+            return False
+        # A deleted and recreated index comes back empty under the same name
+        stats = await self.get_index_stats()
+        return bool(stats.get("total_vectors"))
+
     async def sync_supabase_to_pinecone(self, supabase_client) -> bool:
-        """Fetch menu_items and restaurant_details from Supabase and upload to Pinecone."""
+        """Fetch menu_items and restaurant_details from Supabase and upload the changed chunks to Pinecone."""
         try:
-            # Reset Pinecone index before uploading new data
-            await self.reset_pinecone_index()
+            if not self.index:
+                logger.warning("Pinecone index not initialized")
+                return False
+
+            # Cheap version probe first: unchanged tables skip the snapshot fetch and all Pinecone calls
+            state = await asyncio.to_thread(self._load_sync_state)
+            probed = await self._probe_sync_state(supabase_client, state)
+            if (probed is not None and not any(table["changed"] for table in probed.values())
+                    and await self._index_matches_sync_state(state)):
+                logger.info("Supabase tables unchanged since last sync, skipping Pinecone update")
+                return True
 
+            # Rows are chunked in insertion order: ids are random UUIDs, so ordering by id would put a new
+            # row at a random position and shift the content (and IDs) of every chunk after it
             # Fetch menu items
-            menu_resp = supabase_client.table('menu_items').select('*').execute()
+            menu_resp = await retry_db_operation(lambda: asyncio.to_thread(supabase_client.table('menu_items').select('id,name,price,description').order('created_at,id').execute))
             menu_items = menu_resp.data if hasattr(menu_resp, 'data') else menu_resp.get('data', [])
 
             # Fetch restaurant details
-            details_resp = supabase_client.table('restaurant_details').select('*').execute()
+            details_resp = await retry_db_operation(lambda: asyncio.to_thread(supabase_client.table('restaurant_details').select('id,details,description').order('created_at,id').execute))
             restaurant_details = details_resp.data if hasattr(details_resp, 'data') else details_resp.get('data', [])
 
             texts = []
@@ -375,14 +803,48 @@ class VectorDatabase:
                     "supabase_ids": [detail['id'] for detail in chunk]
                 })
 
+            # Only chunks whose content changed need embedding; chunks that no longer exist are deleted
+            doc_ids = [self._document_id(text, metadata, i) for i, (text, metadata) in enumerate(zip(texts, metadatas))]
+            stored_hashes = await self._fetch_content_hashes(doc_ids)
+            changed = [
+                i for i, (doc_id, text) in enumerate(zip(doc_ids, texts))
+                if stored_hashes.get(doc_id) != content_hash(text)
+            ]
+
+            try:
+                existing_ids = await self._list_ids(SUPABASE_DOC_PREFIX)
+            except Exception as e:
+                # list() only exists on serverless indexes; pod-based ones get the old reset-and-reupload
+                logger.warning(f"Cannot list vector IDs ({e}), replacing all Supabase chunks")
+                await self._run(self.index.delete, filter={"source": {"$in": list(SUPABASE_SOURCES)}})
+                self._clear_search_cache()
+                existing_ids = []
+                changed = list(range(len(texts)))
+
+            fresh_ids = set(doc_ids)
+            stale_ids = [doc_id for doc_id in existing_ids if doc_id not in fresh_ids]
+            if stale_ids:
+                for i in range(0, len(stale_ids), 1000):
+                    await self._run(self.index.delete, ids=stale_ids[i:i + 1000])
+                self._clear_search_cache()
+                logger.info(f"Deleted {len(stale_ids)} stale Supabase chunks from Pinecone")
+
             if not texts:
                 logger.warning("No data found in Supabase to upload to Pinecone.")
                 return False
 
-            logger.info(f"Uploading {len(texts)} records from Supabase to Pinecone...")
-            result = await self.add_documents(texts, metadatas)
-            logger.info(f"Upload result: {result}")
-            return result
+            if not changed:
+                logger.info(f"All {len(texts)} Supabase chunks are up to date in Pinecone")
+                await self._record_sync_state(probed)
+                return True
+
+            logger.info(f"Uploading {len(changed)} of {len(texts)} records from Supabase to Pinecone...")
+            uploaded = await self._upsert_documents([texts[i] for i in changed], [metadatas[i] for i in changed])
+            logger.info(f"Uploaded {uploaded} of {len(changed)} changed chunks")
+            # Only a complete upload may be recorded; otherwise the next sync must retry the missing chunks
+            if uploaded == len(changed):
+                await self._record_sync_state(probed)
+            return uploaded > 0
         except Exception as e:
             logger.error(f"Error syncing Supabase to Pinecone: {e}")
             return False
\ No newline at end of file